@@ -1,3 +1,102 @@
-# Inicializador del paquete Flask.
-# Se deja vacío intencionalmente para que Python reconozca la carpeta como un
-# módulo y permita importar los submódulos sin problemas.
+"""Paquete de la aplicación Flask.
+
+``create_app`` construye la aplicación completa: proveedor JSON, almacén de
+tareas, cabeceras CORS, la página del frontend y el blueprint de la API.
+Todos los puntos de entrada (``backend.py``, ``wsgi.py`` y las pruebas) la
+obtienen de aquí.
+"""
+
+from pathlib import Path
+from typing import Any
+import hashlib
+
+from flask import Flask, request, send_from_directory
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.exceptions import HTTPException
+
+from json_utils import dumps, loads
+from .models import TASKS_FILE, get_file_storage
+from .routes import api_bp, handle_http_error
+
+STATIC_FOLDER = Path(__file__).resolve().parent.parent / "static"
+
+# Cabeceras CORS fijas: se añaden tal cual a cada respuesta, sin el
+# procesamiento por petición de flask_cors.
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type",
+}
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Proveedor JSON de Flask basado en :func:`dumps` y :func:`loads`.
+
+    Instalado como ``app.json``, hace que ``jsonify`` y ``request.get_json``
+    usen orjson sin tocar los endpoints. Las llamadas con argumentos propios
+    de la librería estándar, y los valores que orjson no admite (enteros de
+    más de 64 bits, por ejemplo), se delegan en la implementación por defecto.
+    """
+
+    sort_keys = False
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        try:
+            return dumps(obj, default=self.default).decode("utf-8")
+        except TypeError:
+            return super().dumps(obj)
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        # Mismos argumentos que jsonify(): un objeto, varios (lista) o kwargs.
+        if args and kwargs:
+            raise TypeError("app.json.response() takes either args or kwargs, not both")
+        obj = args[0] if len(args) == 1 else (args or kwargs or None)
+        # Se pasan los bytes directamente, sin el paso intermedio por str.
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        try:
+            body = dumps(obj, indent=indent, default=self.default)
+        except TypeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def create_app() -> Flask:
+    """Crea y configura la aplicación Flask."""
+    app = Flask(__name__, static_folder=str(STATIC_FOLDER))
+    app.json = FastJSONProvider(app)  # jsonify y get_json usan orjson si está disponible
+    # Almacén de tareas, compartido por todas las aplicaciones que usan el
+    # mismo archivo; las pruebas lo sustituyen por un InMemoryStorage.
+    app.config["STORAGE"] = get_file_storage(TASKS_FILE)
+    app.register_blueprint(api_bp, url_prefix="/api")
+    app.register_error_handler(HTTPException, handle_http_error)
+
+    @app.after_request
+    def add_cors_headers(response):
+        """Permite peticiones desde otros orígenes sin cabeceras adicionales."""
+        response.headers.update(CORS_HEADERS)
+        return response
+
+    # index.html se lee una sola vez al crear la aplicación; cada petición
+    # sirve los bytes en memoria con su ETag, sin volver a tocar el disco.
+    index_bytes = (STATIC_FOLDER / "index.html").read_bytes()
+    index_etag = hashlib.blake2b(index_bytes, digest_size=8).hexdigest()
+
+    @app.route("/")
+    def index():
+        """Sirve la página principal del frontend."""
+        if app.debug:  # En desarrollo, reflejar los cambios sin reiniciar
+            return send_from_directory(app.static_folder, "index.html")
+        response = app.response_class(index_bytes, mimetype="text/html")
+        response.set_etag(index_etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = 300
+        return response.make_conditional(request)
+
+    return app
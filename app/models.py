@@ -1,14 +1,42 @@
-"""Modelo de datos para las tareas Kanban."""
+"""Modelo de datos y almacenamiento de las tareas Kanban.
 
+Las operaciones CRUD las implementa un objeto almacén: ``InMemoryStorage``
+mantiene las tareas sólo en memoria y ``JsonFileStorage`` además las persiste
+en disco. La aplicación usa el que haya en ``app.config["STORAGE"]``.
+"""
+
+from contextlib import contextmanager
 from dataclasses import dataclass, field
-from typing import List
-import json
+from typing import Dict, Iterable, Iterator, List
+import atexit
+import hashlib
 import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+from json_utils import dumps, loads
 
 TASKS_FILE = "tasks.json"
 DEFAULT_STATE = "Por Hacer"
+VALID_STATES = frozenset({"Por Hacer", "En Progreso", "Hecho"})
+# Segundos que se esperan tras una modificación antes de escribir en disco, de
+# modo que una ráfaga de cambios se agrupe en una única escritura. Con 0 la
+# escritura es síncrona.
+FLUSH_DELAY = 0.05
+# El registro de cambios se compacta en una instantánea cuando tiene más de
+# LOG_COMPACT_FACTOR líneas por tarea viva (y al menos LOG_COMPACT_MIN).
+LOG_COMPACT_FACTOR = 4
+LOG_COMPACT_MIN = 64
+# Si es True cada escritura se sincroniza con fsync antes de darla por hecha.
+# Desactivarlo abarata las escrituras a costa de poder perder los últimos
+# cambios si se cae la máquina (no si sólo se cae el proceso).
+FSYNC = True
 
-@dataclass
+@dataclass(slots=True)
 class Task:
     """Representa una tarea con id, contenido y estado."""
     id: int
@@ -35,59 +63,459 @@ class Task:
             state=data.get("state", DEFAULT_STATE),
         )
 
-# Funciones de acceso al almacenamiento JSON ---------------------------------
+# Funciones de acceso a los archivos JSON ------------------------------------
+#
+# El estado se guarda en dos archivos: una instantánea (un array JSON, por
+# defecto TASKS_FILE) y, junto a ella, un registro JSON Lines (``tasks.jsonl``)
+# al que cada modificación añade una línea. Al cargar se lee la instantánea y
+# se reaplica el registro; cuando éste crece demasiado se compacta en una
+# nueva instantánea. Así una modificación cuesta una línea y no reescribir todo.
+# Tras compactar, el registro sólo conserva, si hace falta, el contador de ids,
+# para que los ids de tareas borradas no se reutilicen al reiniciar.
+
+def _log_path(path) -> str:
+    """Ruta del registro JSON Lines asociado a la instantánea ``path``."""
+    return os.path.splitext(str(path))[0] + ".jsonl"
+
+def _stat(path) -> tuple:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return (None, None)
+    return (st.st_mtime_ns, st.st_size)
+
+def _file_key(path) -> tuple:
+    """Devuelve la firma actual (ruta, mtime y tamaño) de la instantánea y el registro."""
+    return (str(path),) + _stat(path) + _stat(_log_path(path))
+
+def _read_snapshot(path) -> Dict[int, Task]:
+    try:
+        # Sin buffer: read() dimensiona la lectura con fstat y trae el archivo
+        # de una vez, que se parsea directamente desde bytes.
+        with open(path, "rb", buffering=0) as f:
+            raw = f.read()
+        if not raw:
+            return {}
+        return {task.id: task for task in map(Task.from_dict, loads(raw))}
+    except (OSError, KeyError, TypeError, ValueError, AttributeError):  # Archivo ilegible o con otro formato
+        return {}
+
+def _replay_log(path, tasks: Dict[int, Task]) -> tuple[int, int]:
+    """Aplica sobre ``tasks`` las operaciones del registro.
+
+    Devuelve cuántas operaciones había y el menor id que puede recibir una
+    tarea nueva según el registro: mayor que cualquier id creado o borrado, y
+    al menos el contador guardado al compactar (``{"op": "next_id", ...}``).
+
+    Si una escritura se interrumpió, el registro acaba en una línea a medias
+    sin salto de línea final. Esa línea se descarta y se recorta del archivo:
+    de lo contrario la siguiente operación añadida quedaría pegada a ella y se
+    perdería al volver a cargar.
+    """
+    log_path = _log_path(path)
+    try:
+        with open(log_path, "rb", buffering=0) as f:
+            raw = f.read()
+        if raw and not raw.endswith(b"\n"):
+            raw = raw[:raw.rfind(b"\n") + 1]
+            os.truncate(log_path, len(raw))
+    except OSError:
+        return 0, 1
+    count, next_id = 0, 1
+    for line in raw.splitlines():
+        # Una línea dañada, o que no es una operación válida, se ignora.
+        try:
+            entry = loads(line)
+            if entry["op"] == "upsert":
+                task = Task.from_dict(entry["task"])
+                tasks[task.id] = task
+                next_id = max(next_id, task.id + 1)
+            elif entry["op"] == "delete":
+                tasks.pop(entry["id"], None)
+                next_id = max(next_id, entry["id"] + 1)
+            elif entry["op"] == "next_id":
+                next_id = max(next_id, entry["next_id"])
+        except (KeyError, TypeError, ValueError, AttributeError):
+            continue
+        count += 1
+    return count, next_id
+
+def _write_all(fd: int, data: bytes) -> None:
+    """Escribe ``data`` completo en ``fd`` con os.write() y, si FSYNC, lo sincroniza."""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+    if FSYNC:
+        os.fsync(fd)
+
+def _write_file(path: str, payload: bytes) -> None:
+    """Escribe ``payload`` en ``path`` de forma atómica.
+
+    El contenido se vuelca con os.write() sobre un archivo temporal, sin
+    pasar por las capas de buffer de ``open``; después se renombra sobre
+    ``path``, de modo que un lector nunca ve un archivo a medio escribir.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"  # Nadie más lo abre: no hace falta bloquearlo
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        _write_all(fd, payload)
+    finally:
+        os.close(fd)
+    os.replace(tmp_path, path)
 
-def _load_tasks() -> List[Task]:
-    """Carga la lista completa de tareas desde el archivo JSON.
+def _append_log(path: str, ops: List[dict]) -> None:
+    """Añade ``ops`` al registro de ``path``, una línea JSON por operación.
 
-    Si el archivo no existe, devuelve una lista vacía.
+    Dentro del proceso los volcados ya están serializados por el almacén. El
+    flock exclusivo sólo garantiza que, si otro proceso añade al mismo
+    registro (una herramienta externa, por ejemplo), las líneas de ambos no
+    se intercalen; no hace que la aplicación admita varios workers, ya que
+    cada proceso tiene su propia copia de las tareas (ver ``wsgi.py``). El
+    bloqueo se libera al cerrar ``fd``.
     """
-    if not os.path.exists(TASKS_FILE):
-        return []
+    payload = b"".join(dumps(op) + b"\n" for op in ops)
+    fd = os.open(_log_path(path), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
     try:
-        with open(TASKS_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return [Task.from_dict(item) for item in data]
-    except (json.JSONDecodeError, OSError):  # Manejo de errores comunes
-        return []
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        _write_all(fd, payload)
+    finally:
+        os.close(fd)
 
-def _save_tasks(tasks: List[Task]) -> None:
-    """Guarda la lista de tareas en el archivo JSON.
+# Almacenes -------------------------------------------------------------------
 
-    Args:
-        tasks: Lista de instancias Task a persistir.
+class InMemoryStorage:
+    """Almacén de tareas que sólo vive en memoria.
+
+    Las tareas se indexan por id en un dict (que conserva el orden de
+    inserción). Implementa las operaciones CRUD; las subclases añaden la
+    persistencia sobrescribiendo ``_load``, ``_record`` y ``flush``.
     """
-    with open(TASKS_FILE, "w", encoding="utf-8") as f:
-        json.dump([task.to_dict() for task in tasks], f, indent=2)
-
-# Operaciones CRUD ------------------------------------------------------------
-
-def get_all_tasks() -> List[Task]:
-    return _load_tasks()
-
-def add_task(content: str) -> Task:
-    tasks = _load_tasks()
-    new_id = max((t.id for t in tasks), default=0) + 1
-    task = Task(id=new_id, content=content)
-    tasks.append(task)
-    _save_tasks(tasks)
-    return task
-
-def update_task(task_id: int, *, content: str | None = None, state: str | None = None) -> Task:
-    tasks = _load_tasks()
-    for t in tasks:
-        if t.id == task_id:
+
+    def __init__(self, tasks: Iterable[Task] = ()):
+        # _lock serializa las operaciones CRUD.
+        self._lock = threading.RLock()
+        self._tasks: Dict[int, Task] = {task.id: task for task in tasks}
+        # Id que recibirá la próxima tarea creada.
+        self._next_id = max(self._tasks, default=0) + 1
+        # Se incrementa cada vez que cambian las tareas.
+        self._generation = 0
+        # Lista completa serializada tal como la devuelve la API, con su
+        # resumen (para ETag) y la generación a la que corresponde.
+        self._json_cache: tuple[int, bytes, str] | None = None
+
+    def _load(self) -> Dict[int, Task]:
+        """Devuelve el índice actual de tareas."""
+        return self._tasks
+
+    def _record(self, op: dict) -> None:
+        """Anota un cambio ya aplicado al índice.
+
+        Args:
+            op: Operación realizada, ``{"op": "upsert", "task": {...}}`` o
+                ``{"op": "delete", "id": ...}``.
+        """
+        self._generation += 1
+
+    def flush(self) -> None:
+        """Escribe los cambios pendientes; en memoria no hay nada que hacer."""
+
+    @contextmanager
+    def grouped_writes(self) -> Iterator[None]:
+        """Ejecuta el bloque con el almacén bloqueado."""
+        with self._lock:
+            yield
+
+    # Operaciones CRUD --------------------------------------------------------
+
+    def get_all_tasks(self) -> List[Task]:
+        with self._lock:
+            return list(self._load().values())
+
+    def get_task(self, task_id: int) -> Task:
+        with self._lock:
+            t = self._load().get(task_id)
+            if t is None:
+                raise KeyError(f"Task with id {task_id} not found")
+            return t
+
+    def get_tasks_json(self) -> tuple[bytes, str]:
+        """Devuelve la lista de tareas serializada en JSON y un resumen de ella.
+
+        La serialización se hace una sola vez por cada estado de las tareas;
+        mientras no cambien, las lecturas sólo copian los bytes. El resumen
+        cambia con el contenido y sirve como ETag.
+        """
+        with self._lock:
+            self._load()  # Detecta también cambios externos
+            cache = self._json_cache
+            if cache is not None and cache[0] == self._generation:
+                return cache[1], cache[2]
+        return self._build_json()
+
+    def _build_json(self) -> tuple[bytes, str]:
+        """Serializa la lista de tareas y la guarda en la caché de ``get_tasks_json``.
+
+        Con el almacén bloqueado sólo se copian las tareas; la serialización
+        y el resumen se calculan sin bloquearlo. El resultado se guarda si es
+        más reciente que el que ya hubiera en la caché.
+        """
+        with self._lock:
+            tasks = self._load()
+            generation = self._generation
+            records = [t.to_dict() for t in tasks.values()]
+        body = dumps(records)
+        digest = hashlib.blake2b(body, digest_size=8).hexdigest()
+        with self._lock:
+            if self._json_cache is None or self._json_cache[0] < generation:
+                self._json_cache = (generation, body, digest)
+        return body, digest
+
+    def add_task(self, content: str, state: str = DEFAULT_STATE) -> Task:
+        with self._lock:
+            tasks = self._load()
+            task = Task(id=self._next_id, content=content, state=state)
+            self._next_id += 1
+            tasks[task.id] = task
+            self._record({"op": "upsert", "task": task.to_dict()})
+            return task
+
+    def add_tasks(self, entries: List[tuple[str, str]]) -> List[Task]:
+        """Crea varias tareas con una única escritura.
+
+        Args:
+            entries: Pares (contenido, estado) de las tareas a crear.
+        """
+        with self.grouped_writes():
+            return [self.add_task(content, state) for content, state in entries]
+
+    def update_task(self, task_id: int, *, content: str | None = None, state: str | None = None) -> Task:
+        with self._lock:
+            t = self._load().get(task_id)
+            if t is None:
+                raise KeyError(f"Task with id {task_id} not found")
             if content is not None:
                 t.content = content
             if state is not None:
                 t.state = state
-            _save_tasks(tasks)
+            self._record({"op": "upsert", "task": t.to_dict()})
             return t
-    raise KeyError(f"Task with id {task_id} not found")
-
-def delete_task(task_id: int) -> None:
-    tasks = _load_tasks()
-    new_tasks = [t for t in tasks if t.id != task_id]
-    if len(new_tasks) == len(tasks):  # No se encontró el id
-        raise KeyError(f"Task with id {task_id} not found")
-    _save_tasks(new_tasks)
+
+    def delete_task(self, task_id: int) -> None:
+        with self._lock:
+            if self._load().pop(task_id, None) is None:  # No se encontró el id
+                raise KeyError(f"Task with id {task_id} not found")
+            self._record({"op": "delete", "id": task_id})
+
+
+class JsonFileStorage(InMemoryStorage):
+    """Almacén de tareas persistido en una instantánea JSON y su registro.
+
+    Las tareas se mantienen en memoria y se recargan sólo si los archivos
+    cambian por fuera (firma ruta/mtime/tamaño distinta). Las modificaciones
+    se escriben en segundo plano: un hilo añade al registro, pasados
+    ``flush_delay`` segundos, todas las operaciones acumuladas.
+    """
+
+    def __init__(self, path=TASKS_FILE, *, flush_delay: float = FLUSH_DELAY):
+        super().__init__()
+        self.path = str(path)
+        self.flush_delay = flush_delay
+        # Firma de los archivos cuando se cargaron o escribieron por última vez.
+        self._key: tuple | None = None
+        # Operaciones aún no añadidas al registro y líneas que ya contiene.
+        self._pending_ops: List[dict] = []
+        self._log_entries = 0
+        # _dirty indica que hay cambios aún no escritos en disco, ya estén en
+        # _pending_ops o en un volcado en curso (_inflight cuenta éstos).
+        self._dirty = threading.Event()
+        self._inflight = 0
+        # Sólo un volcado escribe a la vez. La E/S se hace con este lock y sin
+        # el del almacén, para que las peticiones no esperen al disco.
+        self._flush_lock = threading.Lock()
+        self._flusher: threading.Thread | None = None
+        # Se activa en close() para detener el hilo de volcado.
+        self._closing = threading.Event()
+        # Profundidad de bloques grouped_writes() activos.
+        self._group_depth = 0
+        # Un volcado falló: el próximo debe compactar.
+        self._compact_needed = False
+        atexit.register(self.flush)
+
+    def _load(self) -> Dict[int, Task]:
+        """Devuelve las tareas, recargándolas de disco si los archivos cambiaron.
+
+        Con cambios pendientes de volcar la copia en memoria es la válida.
+        """
+        with self._lock:
+            if self._dirty.is_set():
+                return self._tasks
+            key = _file_key(self.path)
+            if key == self._key:
+                return self._tasks
+            tasks = _read_snapshot(self.path)
+            self._log_entries, next_id = _replay_log(self.path, tasks)
+            self._tasks, self._key = tasks, key
+            self._next_id = max(max(tasks, default=0) + 1, next_id)
+            self._generation += 1
+            return tasks
+
+    def _record(self, op: dict) -> None:
+        """Anota ``op`` como pendiente y programa su escritura."""
+        with self._lock:
+            self._pending_ops.append(op)
+            self._generation += 1
+            self._dirty.set()
+            if self._group_depth:
+                return  # grouped_writes() vuelca al cerrar el bloque
+            if self.flush_delay <= 0 or self._closing.is_set():
+                self.flush()
+            else:
+                self._start_flusher()
+
+    def compact(self) -> None:
+        """Vuelca las tareas en memoria a una nueva instantánea y vacía el registro.
+
+        Si la instantánea se escribe pero el registro no llega a borrarse,
+        volver a aplicarlo produce el mismo estado, ya que sus operaciones son
+        idempotentes.
+        """
+        self._write_out(compact=True)
+
+    def flush(self) -> None:
+        """Escribe en disco los cambios pendientes, si los hay.
+
+        Las operaciones se añaden al registro; si éste supera
+        LOG_COMPACT_FACTOR veces el número de tareas (con un mínimo de
+        LOG_COMPACT_MIN líneas) se compacta.
+        """
+        self._write_out(compact=False)
+
+    def _write_out(self, compact: bool) -> None:
+        """Implementa ``flush`` y ``compact``.
+
+        Con el almacén bloqueado sólo se recogen las operaciones pendientes
+        (o, al compactar, una copia de las tareas) y se toma ``_flush_lock``;
+        la escritura se hace después, ya sin bloquear el almacén. Como
+        ``_flush_lock`` se toma antes de soltar el almacén, los volcados
+        llegan al disco en el mismo orden en que se recogieron.
+        """
+        with self._lock:
+            if not (compact or self._dirty.is_set() or self._compact_needed):
+                return
+            tasks = self._load()
+            ops, self._pending_ops = self._pending_ops, []
+            compact = compact or self._compact_needed or (
+                self._log_entries + len(ops) > max(LOG_COMPACT_FACTOR * len(tasks), LOG_COMPACT_MIN)
+            )
+            records = [t.to_dict() for t in tasks.values()] if compact else None
+            next_id = self._next_id
+            self._compact_needed = False
+            self._inflight += 1
+            self._flush_lock.acquire()
+        failed = False
+        try:
+            if records is not None:
+                _write_file(self.path, dumps(records))
+                if next_id > max((r["id"] for r in records), default=0) + 1:
+                    # La instantánea no refleja los ids ya borrados: el
+                    # registro conserva el contador para no reutilizarlos.
+                    _write_file(_log_path(self.path), dumps({"op": "next_id", "next_id": next_id}) + b"\n")
+                    self._log_entries = 1
+                else:
+                    try:
+                        os.remove(_log_path(self.path))
+                    except FileNotFoundError:
+                        pass
+                    self._log_entries = 0
+            elif ops:
+                _append_log(self.path, ops)
+                self._log_entries += len(ops)
+        except OSError:
+            failed = True
+            raise
+        finally:
+            self._flush_lock.release()
+            with self._lock:
+                self._inflight -= 1
+                if failed:
+                    # No se puede saber qué llegó al registro, ni devolver las
+                    # operaciones a la cola sin desordenarlas respecto a
+                    # volcados posteriores: el siguiente volcado reescribe la
+                    # instantánea completa desde memoria.
+                    self._compact_needed = True
+                elif not self._pending_ops and not self._inflight:
+                    self._key = _file_key(self.path)
+                    self._dirty.clear()
+
+    @contextmanager
+    def grouped_writes(self) -> Iterator[None]:
+        """Agrupa las modificaciones del bloque en una única escritura a disco.
+
+        El bloque se ejecuta con el almacén bloqueado, de modo que el hilo de
+        volcado no escribe estados intermedios; al salir se vuelca todo de una
+        vez.
+        """
+        outermost = False
+        try:
+            with self._lock:
+                self._group_depth += 1
+                try:
+                    yield
+                finally:
+                    self._group_depth -= 1
+                    outermost = not self._group_depth
+        finally:
+            if outermost:  # Se vuelca ya sin el almacén bloqueado
+                self.flush()
+
+    def close(self) -> None:
+        """Detiene el hilo de volcado y escribe los cambios pendientes.
+
+        Después el almacén sigue siendo utilizable, pero cada modificación se
+        escribe en el momento. Ya no se vuelca al salir del proceso, ni lo
+        devuelve ``get_file_storage``.
+        """
+        self._closing.set()
+        self._dirty.set()  # Despierta al hilo si estaba esperando cambios
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+        atexit.unregister(self.flush)
+        with _FILE_STORAGES_LOCK:
+            if _FILE_STORAGES.get(os.path.abspath(self.path)) is self:
+                del _FILE_STORAGES[os.path.abspath(self.path)]
+
+    def _flush_loop(self) -> None:
+        while not self._closing.is_set():
+            self._dirty.wait()
+            self._closing.wait(self.flush_delay)  # Agrupa la ráfaga de cambios
+            try:
+                self.flush()
+            except OSError:
+                continue  # Los cambios siguen pendientes; se reintenta en la próxima vuelta
+            self._build_json()  # Deja lista la respuesta para la próxima lectura
+
+    def _start_flusher(self) -> None:
+        if self._flusher is None and not self._closing.is_set():
+            self._flusher = threading.Thread(target=self._flush_loop, name="tasks-flusher", daemon=True)
+            self._flusher.start()
+
+
+# Almacenes en disco del proceso, por ruta absoluta de la instantánea.
+_FILE_STORAGES: Dict[str, JsonFileStorage] = {}
+_FILE_STORAGES_LOCK = threading.Lock()
+
+def get_file_storage(path=TASKS_FILE) -> JsonFileStorage:
+    """Devuelve el ``JsonFileStorage`` de ``path``, creándolo la primera vez.
+
+    Todas las aplicaciones del proceso que usan el mismo archivo comparten
+    así un único almacén y un único hilo de volcado, en lugar de tener cada
+    una su copia y pisarse los cambios en disco.
+    """
+    key = os.path.abspath(path)
+    with _FILE_STORAGES_LOCK:
+        storage = _FILE_STORAGES.get(key)
+        if storage is None:
+            storage = _FILE_STORAGES[key] = JsonFileStorage(path)
+        return storage
@@ -1,75 +1,164 @@
 """Rutas API RESTful para gestionar tareas Kanban."""
 
-from flask import Blueprint, request, jsonify, abort
+from flask import Blueprint, current_app, request, jsonify, abort
 from typing import Any
 
-from .models import (
-    get_all_tasks,
-    add_task,
-    update_task,
-    delete_task,
-)
+from werkzeug.exceptions import HTTPException
+
+from json_utils import dumps
+from .models import DEFAULT_STATE, VALID_STATES, InMemoryStorage
 
 api_bp = Blueprint("api", __name__)
 
+_CREATE_KEYS = ("content",)
+_BULK_KEYS = ("tasks",)
+
 # ---------------------------------------------------------------------------
-# Helpers de validación
+# Helpers
 # ---------------------------------------------------------------------------
 
-def _validate_json(required_keys: list[str]) -> dict:
-    if not request.is_json:
-        abort(400, description="Request must be JSON")
+def _storage() -> InMemoryStorage:
+    """Almacén de tareas configurado en la aplicación actual."""
+    return current_app.config["STORAGE"]
+
+def _validate_json(required_keys: tuple[str, ...]) -> dict:
+    # get_json ya devuelve None si el Content-Type no es JSON o el cuerpo no
+    # se puede parsear, así que no hace falta consultar request.is_json.
     data = request.get_json(silent=True)
-    if data is None:
-        abort(400, description="Malformed JSON payload")
+    if not isinstance(data, dict):
+        abort(400, description="Request body must be a JSON object")
     missing = [k for k in required_keys if k not in data]
     if missing:
         abort(400, description=f"Missing keys: {', '.join(missing)}")
     return data
 
+def _clean_content(value: Any) -> str:
+    """Devuelve el contenido sin espacios sobrantes; aborta con 400 si queda vacío."""
+    content = (value if isinstance(value, str) else str(value)).strip()
+    if not content:
+        abort(400, description="Content cannot be empty")
+    return content
+
+def _check_state(value: Any) -> None:
+    if not isinstance(value, str) or value not in VALID_STATES:
+        abort(400, description=f"Invalid state: {value!r}")
+
+# ---------------------------------------------------------------------------
+# Errores
+# ---------------------------------------------------------------------------
+
+def _error_body(name: str, description: str) -> bytes:
+    """Cuerpo JSON de un error."""
+    return dumps({"error": name, "message": description})
+
+def handle_http_error(exc: HTTPException):
+    """Devuelve los errores de la API como JSON en lugar de la página HTML.
+
+    Se registra en la aplicación (ver ``create_app``) y no en el blueprint,
+    para cubrir también los errores de enrutado (404 de rutas inexistentes,
+    405) y los 500 de excepciones no capturadas, que Flask convierte en
+    ``InternalServerError``. Fuera de ``/api/`` se mantiene la respuesta por
+    defecto.
+    """
+    if not request.path.startswith("/api/"):
+        return exc
+    response = current_app.response_class(
+        _error_body(exc.name, exc.description), status=exc.code, mimetype="application/json"
+    )
+    # Se conservan las cabeceras propias del error, como Allow en un 405.
+    for name, value in exc.get_headers(request.environ):
+        if name.lower() != "content-type":
+            response.headers.add(name, value)
+    return response
+
 # ---------------------------------------------------------------------------
 # Endpoints
 # ---------------------------------------------------------------------------
 @api_bp.route("/tasks", methods=["GET"])
 def get_tasks():
-    """Devuelve todas las tareas en formato JSON."""
-    tasks = [t.to_dict() for t in get_all_tasks()]
-    return jsonify(tasks), 200
+    """Devuelve todas las tareas en formato JSON.
+
+    El cuerpo se reutiliza mientras las tareas no cambien y se acompaña de un
+    ETag, de modo que un cliente que sondea recibe 304 si no hay novedades.
+    """
+    body, etag = _storage().get_tasks_json()
+    response = current_app.response_class(body, mimetype="application/json")
+    response.set_etag(etag, weak=True)
+    return response.make_conditional(request)
+
+@api_bp.route("/tasks/<int:task_id>", methods=["GET"])
+def get_task(task_id):
+    """Devuelve una tarea por su id."""
+    try:
+        task = _storage().get_task(task_id)
+    except KeyError as exc:
+        abort(404, description=exc.args[0])
+    return jsonify(task.to_dict()), 200
 
 @api_bp.route("/tasks", methods=["POST"])
 def create_task():
     """Crea una nueva tarea.
 
-    Espera un JSON con la clave 'content'. El estado se inicializa a 'Por Hacer' y se genera un id único.
+    Espera un JSON con la clave 'content' y, opcionalmente, 'state'. El estado
+    se inicializa a 'Por Hacer' si no se indica y se genera un id único.
     """
-    data = _validate_json(["content"])
-    content = str(data["content"]).strip()
-    if not content:
-        abort(400, description="Content cannot be empty")
-    task = add_task(content)
+    data = _validate_json(_CREATE_KEYS)
+    state = data.get("state", DEFAULT_STATE)
+    _check_state(state)
+    task = _storage().add_task(_clean_content(data["content"]), state)
     return jsonify(task.to_dict()), 201
 
+@api_bp.route("/tasks/bulk", methods=["POST"])
+def create_tasks_bulk():
+    """Crea varias tareas en una sola petición.
+
+    Espera un JSON ``{"tasks": [{"content": ..., "state": ...}, ...]}``; 'state'
+    es opcional. Todas las tareas se validan antes de crear ninguna y se
+    persisten con una única escritura.
+    """
+    data = _validate_json(_BULK_KEYS)
+    items = data["tasks"]
+    if not isinstance(items, list):
+        abort(400, description="'tasks' must be a list")
+    entries = []
+    for item in items:
+        if not isinstance(item, dict) or "content" not in item:
+            abort(400, description="Each task must be an object with a 'content' key")
+        state = item.get("state", DEFAULT_STATE)
+        _check_state(state)
+        entries.append((_clean_content(item["content"]), state))
+    tasks = _storage().add_tasks(entries)
+    return jsonify([t.to_dict() for t in tasks]), 201
+
 @api_bp.route("/tasks/<int:task_id>", methods=["PUT"])
 def modify_task(task_id):
-    """Actualiza el contenido o estado de una tarea existente."""
-    data = request.get_json(silent=True) or {}
+    """Actualiza el contenido o estado de una tarea existente.
+
+    ``state`` debe ser uno de VALID_STATES; cualquier otro valor se rechaza
+    con 400 (antes se aceptaba cualquier cadena).
+    """
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    elif not isinstance(data, dict):
+        abort(400, description="Request body must be a JSON object")
     content = data.get("content")
     state = data.get("state")
     if content is not None:
-        content = str(content).strip()
-        if not content:
-            abort(400, description="Content cannot be empty")
+        content = _clean_content(content)
+    if state is not None:
+        _check_state(state)
     try:
-        task = update_task(task_id, content=content, state=state)
+        task = _storage().update_task(task_id, content=content, state=state)
     except KeyError as exc:
-        abort(404, description=str(exc))
+        abort(404, description=exc.args[0])
     return jsonify(task.to_dict()), 200
 
 @api_bp.route("/tasks/<int:task_id>", methods=["DELETE"])
 def remove_task(task_id):
     """Elimina una tarea por su id."""
     try:
-        delete_task(task_id)
+        _storage().delete_task(task_id)
     except KeyError as exc:
-        abort(404, description=str(exc))
+        abort(404, description=exc.args[0])
     return jsonify({"message": f"Task {task_id} deleted successfully"}), 200
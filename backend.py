@@ -1,26 +1,31 @@
 #!/usr/bin/env python3
 """Entrypoint del servidor Flask.
 
-Este archivo expone la ruta raíz que sirve el frontend (index.html) y configura
-el blueprint de la aplicación.
+La aplicación se construye con :func:`app.create_app`; este archivo sólo la
+instancia y la arranca cuando se ejecuta como script.
 """
 
-from flask import Flask, send_from_directory
-from flask_cors import CORS
 import os
+import signal
+import sys
 
-# Importar el blueprint de las rutas API
-from app.routes import api_bp
+from app import create_app
 
-app = Flask(__name__, static_folder="static")
-CORS(app)  # Permite peticiones desde el mismo dominio sin cabeceras adicionales
-app.register_blueprint(api_bp, url_prefix="/api")
-
-@app.route("/")
-def index():
-    """Sirve la página principal del frontend."""
-    return send_from_directory(app.static_folder, "index.html")
+app = create_app()
 
 if __name__ == "__main__":
-    # Ejecutar en modo desarrollo con recarga automática
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    # Servir con waitress (WSGI multihilo, con keep-alive) si está instalado.
+    # Sin él, o con FLASK_DEBUG=1 para tener recarga automática, se usa el
+    # servidor de desarrollo de Flask.
+    debug = os.environ.get("FLASK_DEBUG") == "1"
+    # Convertir SIGTERM en una salida normal para que atexit vuelque los
+    # cambios de tareas aún pendientes.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        from waitress import serve
+    except ImportError:
+        serve = None
+    if serve is None or debug:
+        app.run(host="0.0.0.0", port=5000, debug=debug, threaded=True)
+    else:
+        serve(app, host="0.0.0.0", port=5000, threads=8, connection_limit=1000, channel_timeout=30)
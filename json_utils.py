@@ -0,0 +1,55 @@
+"""Serialización JSON compartida por ``tasks.py`` y el paquete ``app``.
+
+Usa ``orjson`` cuando está instalado y recurre a la librería estándar en caso
+contrario. Ambas variantes trabajan con ``bytes`` codificados en UTF-8. El
+módulo no depende de Flask, para que ``tasks.py`` pueda usarlo sin cargar la
+aplicación web.
+"""
+
+import json
+from typing import Any, Callable
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+if orjson is not None:
+    # Igual que la librería estándar: las fechas y dataclasses se dejan a
+    # ``default`` y las claves no str se convierten a str.
+    _ORJSON_OPTIONS = (
+        orjson.OPT_PASSTHROUGH_DATETIME
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+        | orjson.OPT_NON_STR_KEYS
+    )
+
+
+def dumps(obj: Any, *, indent: bool = False, default: Callable[[Any], Any] | None = None) -> bytes:
+    """Serializa ``obj`` a bytes UTF-8.
+
+    Args:
+        obj: Objeto serializable en JSON.
+        indent: Si es True, indenta con dos espacios; si no, la salida es
+            compacta, sin espacios tras ``,`` ni ``:``.
+        default: Función que convierte los objetos no serializables.
+    """
+    if orjson is not None:
+        option = (_ORJSON_OPTIONS | orjson.OPT_INDENT_2) if indent else _ORJSON_OPTIONS
+        return orjson.dumps(obj, default=default, option=option)
+    if indent:
+        return json.dumps(obj, ensure_ascii=False, indent=2, default=default).encode("utf-8")
+    return json.dumps(
+        obj, ensure_ascii=False, separators=(",", ":"), default=default
+    ).encode("utf-8")
+
+
+def loads(data: bytes | str) -> Any:
+    """Deserializa un documento JSON.
+
+    Los errores de formato se propagan como ``json.JSONDecodeError`` (de la
+    que también hereda ``orjson.JSONDecodeError``).
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
@@ -4,26 +4,37 @@ Business logic for managing Kanban tasks.
 
 All operations are performed on a JSON file named ``tasks.json`` in the
 project root. The module exposes functions to load, save, generate unique
-IDs and retrieve tasks by ID.
+IDs and retrieve tasks by ID, plus a ``TaskStore`` that indexes a task list
+by ID for repeated lookups.
 """
 
 import json
+import os
+import threading
 from pathlib import Path
 from typing import List, Dict, Optional
 
+from json_utils import dumps, loads
+
 TASKS_FILE = Path(__file__).parent.parent / 'tasks.json'
 
+# Serializes writers so concurrent threads never share the temporary file.
+_WRITE_LOCK = threading.Lock()
+
 # ---------------------------------------------------------------------------
 # File I/O helpers
 # ---------------------------------------------------------------------------
 def cargar_tareas() -> List[Dict]:
     """Load tasks from ``tasks.json``.
 
-    Returns an empty list if the file does not exist or is invalid.
+    The whole file is read with a single unbuffered ``read()`` and parsed
+    from bytes. Returns an empty list if the file does not exist, is empty
+    or is invalid.
     """
     try:
-        with open(TASKS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        with open(TASKS_FILE, 'rb', buffering=0) as f:
+            raw = f.read()
+        return loads(raw) if raw else []
     except FileNotFoundError:
         return []
     except (json.JSONDecodeError, ValueError):
@@ -33,13 +44,21 @@ def cargar_tareas() -> List[Dict]:
 def guardar_tareas(tareas: List[Dict]) -> None:
     """Persist the given task list to ``tasks.json``.
 
-    The file is written atomically by writing to a temporary file and then
-    replacing the original.
+    The file is written atomically: the encoded document is handed to
+    ``os.write`` on a temporary file, flushed with ``fsync`` and then renamed
+    over the original.
     """
+    payload = memoryview(dumps(tareas))
     tmp_file = TASKS_FILE.with_suffix('.tmp')
-    with open(tmp_file, 'w', encoding='utf-8') as f:
-        json.dump(tareas, f, ensure_ascii=False, indent=2)
-    tmp_file.replace(TASKS_FILE)
+    with _WRITE_LOCK:
+        fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            while payload:
+                payload = payload[os.write(fd, payload):]
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        tmp_file.replace(TASKS_FILE)
 
 # ---------------------------------------------------------------------------
 # ID generation and lookup
@@ -48,12 +67,52 @@ def generar_id_unico(tareas: List[Dict]) -> int:
     """Return a new unique integer ID.
 
     The ID is one greater than the maximum existing ID, or 1 if no tasks.
+    This scans the list; a ``TaskStore`` keeps a running counter instead.
     """
-    if not tareas:
-        return 1
-    max_id = max(t['id'] for t in tareas)
-    return max_id + 1
+    return max((t['id'] for t in tareas), default=0) + 1
 
 def obtener_tarea_por_id(tareas: List[Dict], task_id: int) -> Optional[Dict]:
-    """Return the task with ``task_id`` or ``None`` if not found."""
+    """Return the task with ``task_id`` or ``None`` if not found.
+
+    This scans the list; use a ``TaskStore`` to look up many IDs in the same
+    list.
+    """
     return next((t for t in tareas if t['id'] == task_id), None)
+
+# ---------------------------------------------------------------------------
+# Indexed store
+# ---------------------------------------------------------------------------
+class TaskStore:
+    """Task list indexed by ID.
+
+    Lookups are a single dict probe instead of a scan of the list. Task
+    order is preserved.
+    """
+
+    def __init__(self, tareas: Optional[List[Dict]] = None):
+        self._by_id: Dict[int, Dict] = {t['id']: t for t in tareas or ()}
+        # Next ID to hand out; computed once here, then just incremented.
+        self._next_id = max(self._by_id, default=0) + 1
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def tareas(self) -> List[Dict]:
+        """Return the tasks as a list, e.g. to pass to ``guardar_tareas``."""
+        return list(self._by_id.values())
+
+    def obtener_tarea_por_id(self, task_id: int) -> Optional[Dict]:
+        """Return the task with ``task_id`` or ``None`` if not found."""
+        return self._by_id.get(task_id)
+
+    def generar_id_unico(self) -> int:
+        """Reserve and return a new unique integer ID."""
+        nid = self._next_id
+        self._next_id += 1
+        return nid
+
+    def agregar_tarea(self, tarea: Dict) -> None:
+        """Add ``tarea`` to the store, replacing any task with the same ID."""
+        self._by_id[tarea['id']] = tarea
+        if tarea['id'] >= self._next_id:
+            self._next_id = tarea['id'] + 1
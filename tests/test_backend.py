@@ -1,57 +1,306 @@
 """Pruebas unitarias básicas para la API de tareas."""
 
 import json
+import threading
+from datetime import datetime, timezone
+import time
 from pathlib import Path
 
 import pytest
+from app import models
+from app.models import InMemoryStorage, JsonFileStorage
 from backend import app as flask_app
 
-# Configurar el cliente de pruebas Flask
-@pytest.fixture(scope="module")
+# Configurar el cliente de pruebas Flask una sola vez para toda la sesión
+@pytest.fixture(scope="session")
 def client():
+    flask_app.testing = True
     with flask_app.test_client() as client:
         yield client
 
-# Helper para limpiar el archivo JSON antes de cada prueba
+# Cada prueba empieza con un almacén vacío en memoria, sin tocar el disco
 @pytest.fixture(autouse=True)
-def reset_tasks_file(tmp_path):
-    # Reemplazar la ruta del archivo por un temporal
-    from app import models
-    original = models.TASKS_FILE
-    temp = tmp_path / "tasks.json"
-    models.TASKS_FILE = str(temp)
+def reset_storage():
+    original = flask_app.config["STORAGE"]
+    flask_app.config["STORAGE"] = InMemoryStorage()
     yield
-    models.TASKS_FILE = original
+    flask_app.config["STORAGE"] = original
 
-def test_create_task(client):
-    response = client.post("/api/tasks", json={"content": "Test task"})
+# Almacén en disco sobre un directorio temporal, para las pruebas de persistencia
+@pytest.fixture
+def file_storage(tmp_path):
+    storage = JsonFileStorage(tmp_path / "tasks.json")
+    flask_app.config["STORAGE"] = storage
+    yield storage
+    storage.close()
+
+def create_task(client, content, state=None):
+    """Crea una tarea con POST /api/tasks y devuelve su JSON.
+
+    Las claves con valor None no se envían, de modo que el servidor aplica
+    sus valores por defecto.
+    """
+    payload = {k: v for k, v in (("content", content), ("state", state)) if v is not None}
+    response = client.post("/api/tasks", json=payload)
+    assert response.status_code == 201
+    return response.get_json()
+
+def create_tasks(client, entries):
+    """Crea varias tareas con una sola petición a /api/tasks/bulk.
+
+    Args:
+        entries: Pares (contenido, estado) de las tareas a crear.
+    """
+    payload = {"tasks": [{"content": content, "state": state} for content, state in entries]}
+    response = client.post("/api/tasks/bulk", json=payload)
     assert response.status_code == 201
-    data = response.get_json()
-    assert data["content"] == "Test task"
-    assert data["state"] == "Por Hacer"
+    return response.get_json()
+
+@pytest.mark.parametrize("content,state,expected", [
+    ("Test task", None, ("Test task", "Por Hacer")),
+    ("  Padded  ", None, ("Padded", "Por Hacer")),
+    (42, None, ("42", "Por Hacer")),
+    ("Started", "En Progreso", ("Started", "En Progreso")),
+])
+def test_create_task(client, content, state, expected):
+    data = create_task(client, content, state)
+    assert (data["content"], data["state"]) == expected
+
+@pytest.mark.parametrize("payload", [
+    {}, {"content": "   "}, ["content"], None, {"content": "Ok", "state": "Archivada"},
+])
+def test_create_task_rejects_invalid(client, payload):
+    response = client.post("/api/tasks", json=payload)
+    assert response.status_code == 400
+
+def test_create_tasks_bulk(client):
+    created = create_tasks(client, [("First", "Por Hacer"), ("Second", "Hecho")])
+    assert [(t["id"], t["state"]) for t in created] == [(1, "Por Hacer"), (2, "Hecho")]
+    res = client.post("/api/tasks/bulk", json={"tasks": [{"content": "Ok"}, {"content": " "}]})
+    assert res.status_code == 400
+    assert len(client.get("/api/tasks").get_json()) == 2
 
 def test_get_tasks(client):
-    client.post("/api/tasks", json={"content": "First"})
-    client.post("/api/tasks", json={"content": "Second"})
+    create_tasks(client, [("First", "Por Hacer"), ("Second", "Por Hacer")])
     response = client.get("/api/tasks")
     assert response.status_code == 200
     tasks = response.get_json()
     assert len(tasks) == 2
 
-def test_update_task(client):
-    # Crear tarea
-    res = client.post("/api/tasks", json={"content": "To update"})
-    task_id = res.get_json()["id"]
-    # Actualizar estado
-    upd_res = client.put(f"/api/tasks/{task_id}", json={"state": "En Progreso"})
+def test_get_tasks_etag(client):
+    create_task(client, "Cached")
+    first = client.get("/api/tasks")
+    etag = first.headers["ETag"]
+    not_modified = client.get("/api/tasks", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    create_task(client, "New")
+    changed = client.get("/api/tasks", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert len(changed.get_json()) == 2
+
+def test_index_is_cached(client):
+    response = client.get("/")
+    assert response.status_code == 200
+    assert b"<script>" in response.data
+    etag = response.headers["ETag"]
+    assert client.get("/", headers={"If-None-Match": etag}).status_code == 304
+
+@pytest.mark.parametrize("value,expected", [
+    ({"d": datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)}, {"d": "Tue, 02 Jan 2024 03:04:05 GMT"}),
+    ({1: "a"}, {"1": "a"}),
+    ([2**70], [2**70]),
+])
+def test_json_provider_matches_flask(value, expected):
+    with flask_app.app_context():
+        response = flask_app.json.response(value)
+        assert json.loads(response.get_data()) == expected
+        assert json.loads(flask_app.json.dumps(value)) == expected
+
+def test_cors_headers(client):
+    response = client.options("/api/tasks")
+    assert response.headers["Access-Control-Allow-Origin"] == "*"
+    assert "PUT" in response.headers["Access-Control-Allow-Methods"]
+
+@pytest.mark.parametrize("changes", [
+    {"state": "En Progreso"},
+    {"state": "Hecho"},
+    {"content": "Renamed"},
+    {"content": "Renamed", "state": "Hecho"},
+])
+def test_update_task(client, changes):
+    task_id = create_task(client, "To update")["id"]
+    # Actualizar
+    upd_res = client.put(f"/api/tasks/{task_id}", json=changes)
     assert upd_res.status_code == 200
     updated = upd_res.get_json()
-    assert updated["state"] == "En Progreso"
+    assert {k: updated[k] for k in changes} == changes
+
+def test_update_task_rejects_unknown_state(client):
+    task_id = create_task(client, "Stay put")["id"]
+    upd_res = client.put(f"/api/tasks/{task_id}", json={"state": "Archivada"})
+    assert upd_res.status_code == 400
 
 def test_delete_task(client):
-    res = client.post("/api/tasks", json={"content": "Delete me"})
-    task_id = res.get_json()["id"]
+    task_id = create_task(client, "Delete me")["id"]
+    assert client.get(f"/api/tasks/{task_id}").get_json()["content"] == "Delete me"
     del_res = client.delete(f"/api/tasks/{task_id}")
     assert del_res.status_code == 200
     msg = del_res.get_json()
     assert f"{task_id} deleted successfully" in msg["message"]
+    assert client.get(f"/api/tasks/{task_id}").status_code == 404
+
+def test_errors_are_json(client):
+    res = client.delete("/api/tasks/999")
+    assert res.status_code == 404
+    assert res.get_json() == {"error": "Not Found", "message": "Task with id 999 not found"}
+    res = client.post("/api/tasks", json={})
+    assert res.status_code == 400
+    assert res.get_json()["message"] == "Missing keys: content"
+
+@pytest.mark.parametrize("method,path,status", [
+    ("GET", "/api/nope", 404),
+    ("GET", "/api/tasks/abc", 404),
+    ("PATCH", "/api/tasks", 405),
+])
+def test_routing_errors_are_json(client, method, path, status):
+    res = client.open(path, method=method)
+    assert res.status_code == status
+    assert res.mimetype == "application/json"
+    assert set(res.get_json()) == {"error", "message"}
+    if status == 405:
+        assert set(res.allow) == {"GET", "HEAD", "OPTIONS", "POST"}
+
+def test_unhandled_errors_are_json(client, monkeypatch):
+    class BrokenStorage(InMemoryStorage):
+        def get_tasks_json(self):
+            raise RuntimeError("boom")
+
+    monkeypatch.setitem(flask_app.config, "STORAGE", BrokenStorage())
+    monkeypatch.setitem(flask_app.config, "PROPAGATE_EXCEPTIONS", False)
+    res = client.get("/api/tasks")
+    assert res.status_code == 500
+    assert res.get_json()["error"] == "Internal Server Error"
+    assert client.get("/nope").mimetype == "text/html"
+
+def test_deleted_ids_are_not_reused(client):
+    task_id = create_task(client, "Short-lived")["id"]
+    client.delete(f"/api/tasks/{task_id}")
+    assert create_task(client, "Next")["id"] == task_id + 1
+
+def test_changes_are_logged_and_compacted(client, file_storage):
+    first = create_task(client, "Persist me")
+    create_task(client, "Drop me")
+    client.delete("/api/tasks/2")
+    file_storage.flush()
+    log_path = Path(file_storage.path).with_suffix(".jsonl")
+    ops = [json.loads(line)["op"] for line in log_path.read_text().splitlines()]
+    assert ops == ["upsert", "upsert", "delete"]
+    file_storage.compact()
+    # Sólo queda el contador, para no reutilizar el id 2 borrado
+    assert [json.loads(line) for line in log_path.read_text().splitlines()] == [
+        {"op": "next_id", "next_id": 3}
+    ]
+    stored = json.loads(Path(file_storage.path).read_text(encoding="utf-8"))
+    assert stored == [first]
+
+def test_grouped_writes_flush_once(file_storage):
+    log_path = Path(file_storage.path).with_suffix(".jsonl")
+    with file_storage.grouped_writes():
+        file_storage.add_task("One")
+        file_storage.add_task("Two")
+        assert not log_path.exists()
+    assert len(log_path.read_text().splitlines()) == 2
+
+def test_flush_does_not_block_requests(tmp_path, monkeypatch):
+    storage = JsonFileStorage(tmp_path / "tasks.json", flush_delay=60)
+    storage.add_task("A")
+    writing, release = threading.Event(), threading.Event()
+    append_log = models._append_log
+
+    def slow_append_log(path, ops):
+        writing.set()
+        release.wait(5)
+        append_log(path, ops)
+
+    monkeypatch.setattr(models, "_append_log", slow_append_log)
+    flusher = threading.Thread(target=storage.flush)
+    flusher.start()
+    assert writing.wait(5)
+    # Con el volcado a medias, el almacén sigue atendiendo operaciones
+    storage.add_task("B")
+    assert len(storage.get_all_tasks()) == 2
+    assert flusher.is_alive()
+    release.set()
+    flusher.join()
+    storage.close()
+    assert not storage._flusher.is_alive()
+    log_path = Path(storage.path).with_suffix(".jsonl")
+    assert len(log_path.read_text().splitlines()) == 2
+
+def test_flusher_prebuilds_tasks_json(file_storage):
+    file_storage.add_task("Warm")
+    for _ in range(200):
+        cache = file_storage._json_cache
+        if cache is not None and cache[0] == file_storage._generation:
+            break
+        time.sleep(0.01)
+    else:
+        pytest.fail("the flusher did not rebuild the task list")
+    assert json.loads(cache[1])[0]["content"] == "Warm"
+
+def test_log_is_replayed_on_load(client, file_storage):
+    snapshot = Path(file_storage.path)
+    snapshot.write_text(json.dumps([{"id": 1, "content": "Old", "state": "Por Hacer"}]))
+    snapshot.with_suffix(".jsonl").write_text(
+        json.dumps({"op": "upsert", "task": {"id": 1, "content": "Old", "state": "Hecho"}}) + "\n"
+        + json.dumps({"op": "upsert", "task": {"id": 2, "content": "New", "state": "Por Hacer"}}) + "\n"
+    )
+    tasks = client.get("/api/tasks").get_json()
+    assert [(t["id"], t["state"]) for t in tasks] == [(1, "Hecho"), (2, "Por Hacer")]
+
+def test_truncated_log_line_is_discarded(tmp_path):
+    path = tmp_path / "tasks.json"
+    storage = JsonFileStorage(path, flush_delay=0)
+    storage.add_task("A")
+    storage.close()
+    log_path = path.with_suffix(".jsonl")
+    with open(log_path, "ab") as f:
+        f.write(b'{"op":"upsert","ta')  # Escritura interrumpida a medias
+    storage = JsonFileStorage(path, flush_delay=0)
+    storage.add_task("B")
+    storage.close()
+    reloaded = JsonFileStorage(path, flush_delay=0)
+    assert [t.content for t in reloaded.get_all_tasks()] == ["A", "B"]
+    reloaded.close()
+    assert log_path.read_bytes().endswith(b"\n")
+
+def test_deleted_ids_are_not_reused_after_restart(tmp_path):
+    path = tmp_path / "tasks.json"
+    storage = JsonFileStorage(path, flush_delay=0)
+    storage.add_tasks([("Keep", "Por Hacer"), ("Drop", "Por Hacer")])
+    storage.delete_task(2)
+    storage.close()
+    storage = JsonFileStorage(path, flush_delay=0)
+    storage.compact()
+    storage.close()
+    storage = JsonFileStorage(path, flush_delay=0)
+    assert storage.add_task("Next").id == 3
+    storage.close()
+
+def test_invalid_log_entries_are_skipped(tmp_path):
+    path = tmp_path / "tasks.json"
+    path.with_suffix(".jsonl").write_text(
+        '{"op": "upsert"}\n[]\n"text"\n{"op": "delete"}\n'
+        + json.dumps({"op": "upsert", "task": {"id": 1, "content": "Ok"}}) + "\n"
+    )
+    storage = JsonFileStorage(path, flush_delay=0)
+    assert [t.content for t in storage.get_all_tasks()] == ["Ok"]
+    storage.close()
+
+def test_file_storage_is_shared_per_path(tmp_path):
+    path = tmp_path / "tasks.json"
+    storage = models.get_file_storage(path)
+    assert models.get_file_storage(str(path)) is storage
+    storage.close()
+    assert models.get_file_storage(path) is not storage
+    models.get_file_storage(path).close()
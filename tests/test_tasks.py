@@ -1,62 +1,68 @@
 # tests/test_tasks.py
-import json
+import subprocess
+import sys
 from pathlib import Path
-import tempfile
+
 import pytest
 
+import tasks
 # Import the functions from tasks module
 from tasks import (
     cargar_tareas,
     guardar_tareas,
     generar_id_unico,
     obtener_tarea_por_id,
+    TaskStore,
 )
 
 @pytest.fixture
-def temp_tasks_file(tmp_path):
-    """Create a temporary tasks.json file for each test."""
+def temp_tasks_file(tmp_path, monkeypatch):
+    """Point the module's TASKS_FILE at a temporary tasks.json for each test."""
     file = tmp_path / 'tasks.json'
-    # Monkey‑patch the module's TASKS_FILE path
-    from tasks import TASKS_FILE as original
-    import types
-    tasks_module = types.ModuleType('tasks')
-    tasks_module.TASKS_FILE = file
-    yield file
-    # Cleanup is handled by tmp_path
-
-# Helper to load JSON directly for comparison
-
-def load_json(file):
-    with open(file, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    monkeypatch.setattr(tasks, 'TASKS_FILE', file)
+    return file
 
-def test_generar_id_unico_empty(tmp_path):
-    file = tmp_path / 'tasks.json'
-    guardar_tareas([], file=file)
+def test_generar_id_unico_empty():
     assert generar_id_unico([]) == 1
 
-def test_generar_id_unico_nonempty(tmp_path):
-    tasks = [{'id': 2, 'contenido': 'x', 'estado': 'todo'}]
-    file = tmp_path / 'tasks.json'
-    guardar_tareas(tasks, file=file)
-    assert generar_id_unico(tasks) == 3
+def test_generar_id_unico_nonempty():
+    tareas = [{'id': 2, 'contenido': 'x', 'estado': 'todo'}]
+    assert generar_id_unico(tareas) == 3
 
-def test_cargar_y_guardar(tmp_path):
-    tasks = [
+def test_cargar_y_guardar(temp_tasks_file):
+    tareas = [
         {'id': 1, 'contenido': 'Test', 'estado': 'todo'},
         {'id': 2, 'contenido': 'Another', 'estado': 'doing'}
     ]
-    file = tmp_path / 'tasks.json'
-    guardar_tareas(tasks, file=file)
-    loaded = cargar_tareas(file=file)
-    assert loaded == tasks
+    guardar_tareas(tareas)
+    assert temp_tasks_file.exists()
+    assert cargar_tareas() == tareas
 
-def test_obtener_tarea_por_id(tmp_path):
-    tasks = [
+def test_obtener_tarea_por_id():
+    tareas = [
         {'id': 1, 'contenido': 'Task', 'estado': 'todo'},
         {'id': 2, 'contenido': 'Second', 'estado': 'doing'}
     ]
-    file = tmp_path / 'tasks.json'
-    guardar_tareas(tasks, file=file)
-    assert obtener_tarea_por_id(tasks, 1)['contenido'] == 'Task'
-    assert obtener_tarea_por_id(tasks, 3) is None
+    assert obtener_tarea_por_id(tareas, 1)['contenido'] == 'Task'
+    assert obtener_tarea_por_id(tareas, 3) is None
+
+def test_obtener_tarea_por_id_large():
+    tareas = [{'id': i, 'contenido': f'Task {i}', 'estado': 'todo'} for i in range(1, 10_001)]
+    store = TaskStore(tareas)
+    assert len(store) == 10_000
+    assert all(store.obtener_tarea_por_id(t['id']) is t for t in tareas)
+    assert store.obtener_tarea_por_id(10_001) is None
+    assert store.tareas() == tareas
+
+def test_task_store_generar_id_unico():
+    store = TaskStore([{'id': 2, 'contenido': 'x', 'estado': 'todo'}])
+    assert store.generar_id_unico() == 3
+    assert store.generar_id_unico() == 4
+    store.agregar_tarea({'id': 10, 'contenido': 'y', 'estado': 'todo'})
+    assert store.generar_id_unico() == 11
+    assert TaskStore().generar_id_unico() == 1
+
+def test_import_does_not_load_flask():
+    code = "import sys, tasks; sys.exit('flask' in sys.modules or 'app' in sys.modules)"
+    root = Path(__file__).resolve().parent.parent
+    assert subprocess.run([sys.executable, "-c", code], cwd=root).returncode == 0
@@ -0,0 +1,12 @@
+"""Punto de entrada WSGI para servidores de producción.
+
+Ejemplo: ``gunicorn -w 1 -k gthread --threads 8 wsgi:application``.
+
+Las tareas se mantienen en memoria dentro de cada proceso (ver
+``app.models``), así que se debe usar un único worker con varios hilos: con
+varios workers cada uno tendría su propia copia y se pisarían los cambios.
+"""
+
+from app import create_app
+
+application = create_app()